@@ -1,154 +1,187 @@
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 import chromadb
+from chromadb.utils import embedding_functions
+import logging
 import os
+from pypdf import PdfReader
 import re
 
+logger = logging.getLogger(__name__)
+
+# Footer regex used to extract the printed page number, compiled once.
+# The first alternative covers the '[2005-06 ]Budget Paper No. N' footer, the
+# second is a looser fallback; exactly one capture group participates per match.
+_FOOTER_RE = re.compile(
+    r'(?:2005-06 )?Budget Paper No\.\s*\d+\s+(\d+)\s+Financial Policy'
+    r'|Budget.*?Paper.*?(\d+)\s+Financial Policy.*?Statement',
+    re.IGNORECASE,
+)
+
+# Footers sit in the last ~100 characters of each page, so only the tail of a chunk is scanned
+_FOOTER_SCAN_CHARS = 256
+
 def extract_page_number_from_text(text):
     """
     Extract page number from footer text like '2005-06 Budget Paper No. 3 9 Financial Policy...'
     where the page number (9) appears after 'Budget Paper No. 3'
     """
-    # Pattern to match the footer format and extract the page number
-    # Made more specific to avoid false positives
-    patterns = [
-        r'2005-06 Budget Paper No\. \d+\s+(\d+)\s+Financial Policy',  # Most specific pattern
-        r'Budget Paper No\. \d+\s+(\d+)\s+Financial Policy',         # Main pattern
-        r'Budget.*?Paper.*?(\d+)\s+Financial Policy.*?Statement',     # Alternative pattern
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Debug: print what was found
-            page_num = int(match.group(1))
-            print(f"  ✓ Found page {page_num} using pattern: {pattern}")
-            return page_num
+    match = _FOOTER_RE.search(text[-_FOOTER_SCAN_CHARS:])
+    if match:
+        return int(match.group(1) or match.group(2))
     
     return None
 
-def enhance_metadata_with_page_numbers(chunks):
+def prepare_chunks_for_chromadb(chunks):
     """
-    Enhance chunk metadata by extracting actual page numbers from document text
+    Build the ChromaDB documents, metadata and ids for all chunks in a single pass,
+    adding the actual page number extracted from the document text to each chunk's
+    metadata and counting chunks per page for the extraction summary.
     """
-    enhanced_chunks = []
+    documents = [chunk.page_content for chunk in chunks]
+    metadata = []
+    ids = []
+    page_counts = Counter()
+    hits = 0
     
     print(f"Processing {len(chunks)} chunks for page number extraction...")
     
-    for i, chunk in enumerate(chunks):
-        # Get the raw text content
-        text_content = chunk.page_content
-        
-        print(f"Chunk {i}: PDF page {chunk.metadata.get('page', 'unknown')}")
-        
-        # Try to extract page number from the text
-        extracted_page = extract_page_number_from_text(text_content)
-        
-        # Copy original metadata
-        enhanced_metadata = chunk.metadata.copy()
+    # A single precompiled regex search over each chunk's tail; cheaper than
+    # dispatching the work to a process pool
+    extracted_pages = [extract_page_number_from_text(document) for document in documents]
+    
+    for i, (chunk, extracted_page) in enumerate(zip(chunks, extracted_pages)):
+        logger.debug("Chunk %d: PDF page %s", i, chunk.metadata.get('page', 'unknown'))
         
-        # Add extracted page number if found
+        # Use extracted page number if found
         if extracted_page is not None:
-            enhanced_metadata['actual_page'] = extracted_page
-            enhanced_metadata['page_source'] = 'extracted_from_footer'
-            print(f"  → Using extracted page: {extracted_page}")
+            actual_page = extracted_page
+            page_source = 'extracted_from_footer'
+            hits += 1
+            logger.debug("  → Using extracted page: %d", extracted_page)
         else:
             # For this document, PDF pages 0-5 correspond to document pages 5-10
             # So PDF page 0 = document page 5, PDF page 1 = document page 6, etc.
             pdf_page = chunk.metadata.get('page', 0)
-            actual_doc_page = pdf_page + 5  # Adjust based on document's starting page
-            enhanced_metadata['actual_page'] = actual_doc_page
-            enhanced_metadata['page_source'] = 'pdf_metadata'
-            print(f"  → Using PDF metadata page {pdf_page} → document page: {actual_doc_page}")
+            actual_page = pdf_page + 5  # Adjust based on document's starting page
+            page_source = 'pdf_metadata'
+            logger.debug("  → Using PDF metadata page %s → document page: %s", pdf_page, actual_page)
         
-        # Create new chunk with enhanced metadata
-        enhanced_chunk = type(chunk)(
-            page_content=chunk.page_content,
-            metadata=enhanced_metadata
-        )
-        enhanced_chunks.append(enhanced_chunk)
+        # Enhanced metadata with accurate page info and chunk number, built in one allocation
+        metadata.append({
+            **chunk.metadata,
+            'actual_page': actual_page,
+            'page_source': page_source,
+            'chunk_id': i,
+            'document_type': 'financial_policy',
+        })
+        ids.append(f"policy_chunk_{i}")
+        page_counts[f"Page {actual_page} ({page_source})"] += 1
     
-    return enhanced_chunks
+    logger.info("Extracted footer pages for %d/%d chunks", hits, len(chunks))
+    
+    return documents, metadata, ids, page_counts
+
+def load_pdf_pages(path):
+    """
+    Lazily yield one Document per PDF page, reading the text layer with pypdf directly
+    """
+    reader = PdfReader(path)
+    
+    for page_index, page in enumerate(reader.pages):
+        yield Document(
+            page_content=page.extract_text(),
+            metadata={'source': path, 'page': page_index}
+        )
+
+def split_page(page, text_splitter):
+    """
+    Split a single page into chunks; the splitter splits on structural separators and
+    greedily merges the pieces back up to its chunk size
+    """
+    return text_splitter.split_documents([page])
 
 # setting the environment
 
 PDF_PATH = r"policy.pdf"
 CHROMA_PATH = r"chroma_db"
+CHUNK_SIZE = 1000  # Larger chunks for financial documents
+UPSERT_BATCH_SIZE = 256  # Chunks embedded and written per upsert call
 
-# Check if PDF file exists
-if not os.path.exists(PDF_PATH):
-    print(f"Error: {PDF_PATH} not found. Please ensure the policy.pdf file is in the current directory.")
-    exit(1)
+def main():
+    """Load, split and index the policy document into ChromaDB."""
+    # Per-chunk details are logged at DEBUG and stay quiet by default; only this
+    # module is raised to INFO so library INFO logs don't mix into the output
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logger.setLevel(logging.INFO)
 
-chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    # Check if PDF file exists
+    if not os.path.exists(PDF_PATH):
+        print(f"Error: {PDF_PATH} not found. Please ensure the policy.pdf file is in the current directory.")
+        exit(1)
 
-collection = chroma_client.get_or_create_collection(name="financial_policy")
+    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
 
-# loading the document
+    # Chunks are embedded explicitly in batches with the collection's own embedding
+    # function, so the chatbot's query embeddings stay in the same vector space
+    embedder = embedding_functions.DefaultEmbeddingFunction()
 
-print("Loading financial policy document...")
-loader = PyPDFLoader(PDF_PATH)
+    collection = chroma_client.get_or_create_collection(name="financial_policy", embedding_function=embedder)
 
-raw_documents = loader.load()
+    # loading and splitting the document
 
-print(f"Loaded {len(raw_documents)} pages from the policy document.")
+    print("Loading and splitting financial policy document...")
 
-# splitting the document
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=0,  # Overlap only duplicates content across vectors
+        separators=["\n\n", "\n", ". ", " ", ""],  # Paragraphs, lines, sentences, words
+        length_function=len,
+        is_separator_regex=False,
+    )
 
-print("Splitting document into chunks...")
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,  # Larger chunks for financial documents
-    chunk_overlap=200,  # More overlap to maintain context
-    length_function=len,
-    is_separator_regex=False,
-)
+    # Pages are split in worker threads while the loader keeps parsing the next ones
+    # (results come back in page order)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        page_chunks = list(executor.map(split_page, load_pdf_pages(PDF_PATH), repeat(text_splitter)))
 
-chunks = text_splitter.split_documents(raw_documents)
+    print(f"Loaded {len(page_chunks)} pages from the policy document.")
 
-print(f"Created {len(chunks)} text chunks.")
+    # Flatten the per-page chunks
+    chunks = [chunk for page in page_chunks for chunk in page]
 
-# Enhance chunks with better page number extraction
-print("Enhancing metadata with accurate page numbers...")
-enhanced_chunks = enhance_metadata_with_page_numbers(chunks)
+    print(f"Created {len(chunks)} text chunks.")
 
-# preparing to be added in chromadb
+    # preparing to be added in chromadb, with better page number extraction
 
-print("Preparing documents for ChromaDB...")
-documents = []
-metadata = []
-ids = []
+    print("Preparing documents for ChromaDB with accurate page numbers...")
+    documents, metadata, ids, page_counts = prepare_chunks_for_chromadb(chunks)
 
-for i, chunk in enumerate(enhanced_chunks):
-    documents.append(chunk.page_content)
-    ids.append(f"policy_chunk_{i}")
-    
-    # Enhanced metadata with accurate page info and chunk number
-    chunk_metadata = chunk.metadata.copy()
-    chunk_metadata['chunk_id'] = i
-    chunk_metadata['document_type'] = 'financial_policy'
-    metadata.append(chunk_metadata)
-
-# adding to chromadb
-
-print("Adding documents to ChromaDB...")
-collection.upsert(
-    documents=documents,
-    metadatas=metadata,
-    ids=ids
-)
+    # adding to chromadb
+
+    print("Adding documents to ChromaDB...")
+    for start in range(0, len(documents), UPSERT_BATCH_SIZE):
+        end = start + UPSERT_BATCH_SIZE
+        batch_documents = documents[start:end]
+        collection.upsert(
+            documents=batch_documents,
+            embeddings=embedder(batch_documents),
+            metadatas=metadata[start:end],
+            ids=ids[start:end]
+        )
+
+    print(f"Successfully added {len(documents)} chunks to the database!")
 
-print(f"Successfully added {len(documents)} chunks to the database!")
+    # Display page number extraction summary
+    print("\n📄 Page Number Extraction Summary:")
+    for page_info, count in sorted(page_counts.items()):
+        print(f"  {page_info}: {count} chunks")
 
-# Display page number extraction summary
-print("\n📄 Page Number Extraction Summary:")
-page_counts = {}
-for chunk_meta in metadata:
-    page_num = chunk_meta.get('actual_page', 'unknown')
-    page_source = chunk_meta.get('page_source', 'unknown')
-    key = f"Page {page_num} ({page_source})"
-    page_counts[key] = page_counts.get(key, 0) + 1
+    print("Database setup complete. You can now run the chatbot with 'python financial_chatbot.py'")
 
-for page_info, count in sorted(page_counts.items()):
-    print(f"  {page_info}: {count} chunks")
 
-print("Database setup complete. You can now run the chatbot with 'python financial_chatbot.py'")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,39 @@ with conversation memory and context awareness.
 import chromadb
 from openai import OpenAI
 from dotenv import load_dotenv
+import hashlib
 import os
-from typing import List, Dict, Any
+import re
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Any, Iterator
 
 # Load environment variables
 load_dotenv()
 
+# Collapses runs of whitespace when normalizing queries for the retrieval cache
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# System prompt sent with every question; filled in with str.format
+_SYSTEM_TEMPLATE = """
+You are a helpful financial policy assistant. You answer questions about financial policies, budgets, debt, infrastructure, and related topics based on the provided financial policy document.
+
+IMPORTANT GUIDELINES:
+1. Only use information from the provided document excerpts below
+2. Do not use your general knowledge about finance or policies
+3. If the information is not in the provided excerpts, say "I don't have that information in the policy document"
+4. Reference page numbers when available
+5. Consider the conversation history to provide contextual responses
+6. Be precise and cite specific sections when possible
+
+{conversation_context}
+
+{document_context}
+
+Current question: {query}
+
+Please provide a clear, helpful answer based on the financial policy document provided above.
+"""
+
 class FinancialPolicyChatbot:
     def __init__(self):
         """Initialize the chatbot with ChromaDB and OpenAI clients."""
@@ -29,11 +56,36 @@ class FinancialPolicyChatbot:
         self.openai_client = OpenAI()
         
         # Conversation memory - stores recent conversation history
-        self.conversation_history: List[Dict[str, str]] = []
         self.max_history_length = 10  # Keep last 10 exchanges
+        self.conversation_history: Deque[Dict[str, str]] = deque(maxlen=self.max_history_length)
+        
+        # Prompt history of the last few exchanges: each exchange is formatted once when
+        # recorded, and the numbered prompt section is rendered once per turn from them
+        self.prompt_history_length = 5
+        self._history_entries: Deque[str] = deque(maxlen=self.prompt_history_length)
+        self._history_str = ""
+        
+        # LRU cache of model answers keyed by the question, the chunks retrieved for it
+        # and the conversation history sent alongside them
+        self.max_response_cache_size = 256
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        
+        # LRU cache of search results keyed by normalized query; the indexed
+        # document does not change while the chatbot is running
+        self.max_retrieval_cache_size = 128
+        self._retr_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        
+        # Chunk count is only fetched from ChromaDB when first asked for
+        self._count = None
         
         print("Financial Policy Chatbot initialized successfully!")
-        print("Database contains", self.collection.count(), "document chunks.")
+    
+    @property
+    def chunk_count(self) -> int:
+        """Number of document chunks in the database, counted on first access."""
+        if self._count is None:
+            self._count = self.collection.count()
+        return self._count
     
     def search_relevant_content(self, query: str, n_results: int = 3) -> Dict[str, Any]:
         """
@@ -46,10 +98,20 @@ class FinancialPolicyChatbot:
         Returns:
             Dictionary containing relevant documents and metadata
         """
+        cache_key = (_WHITESPACE_RE.sub(' ', query.strip().lower()), n_results)
+        results = self._retr_cache.get(cache_key)
+        if results is not None:
+            self._retr_cache.move_to_end(cache_key)
+            return results
+        
         results = self.collection.query(
             query_texts=[query],
             n_results=n_results
         )
+        
+        self._retr_cache[cache_key] = results
+        if len(self._retr_cache) > self.max_retrieval_cache_size:
+            self._retr_cache.popitem(last=False)
         return results
     
     def build_context_prompt(self, query: str, search_results: Dict[str, Any]) -> str:
@@ -63,13 +125,10 @@ class FinancialPolicyChatbot:
         Returns:
             Formatted system prompt with context
         """
-        # Build conversation context
+        # Build conversation context from the pre-formatted recent history
         conversation_context = ""
-        if self.conversation_history:
-            conversation_context = "\n\nRecent conversation history:\n"
-            for i, exchange in enumerate(self.conversation_history[-5:], 1):  # Last 5 exchanges
-                conversation_context += f"{i}. User: {exchange['user']}\n"
-                conversation_context += f"   Assistant: {exchange['assistant']}\n"
+        if self._history_str:
+            conversation_context = "\n\nRecent conversation history:\n" + self._history_str
         
         # Build document context
         document_context = ""
@@ -90,26 +149,11 @@ class FinancialPolicyChatbot:
                 
                 document_context += f"\n--- Excerpt {i}{page_info} ---\n{doc}\n"
         
-        system_prompt = f"""
-You are a helpful financial policy assistant. You answer questions about financial policies, budgets, debt, infrastructure, and related topics based on the provided financial policy document.
-
-IMPORTANT GUIDELINES:
-1. Only use information from the provided document excerpts below
-2. Do not use your general knowledge about finance or policies
-3. If the information is not in the provided excerpts, say "I don't have that information in the policy document"
-4. Reference page numbers when available
-5. Consider the conversation history to provide contextual responses
-6. Be precise and cite specific sections when possible
-
-{conversation_context}
-
-{document_context}
-
-Current question: {query}
-
-Please provide a clear, helpful answer based on the financial policy document provided above.
-"""
-        return system_prompt
+        return _SYSTEM_TEMPLATE.format(
+            conversation_context=conversation_context,
+            document_context=document_context,
+            query=query,
+        )
     
     def get_response(self, user_query: str) -> str:
         """
@@ -121,13 +165,40 @@ Please provide a clear, helpful answer based on the financial policy document pr
         Returns:
             Chatbot's response
         """
+        return "".join(self.stream_response(user_query))
+    
+    def stream_response(self, user_query: str) -> Iterator[str]:
+        """
+        Stream a response from the chatbot for the user's query as it is generated.
+        
+        Args:
+            user_query: User's question
+            
+        Yields:
+            Pieces of the chatbot's response, in order
+        """
         # Search for relevant content
         search_results = self.search_relevant_content(user_query, n_results=3)
         
+        # Reuse the previous answer when the same question retrieves the same chunks
+        # with the same recent history; the history window is numbered 1..N, so it
+        # depends only on the last exchanges and can repeat across turns and sessions
+        cache_key = hashlib.sha1(
+            (user_query + "|" + ",".join(search_results['ids'][0]) + "|" + self._history_str).encode()
+        ).hexdigest()
+        
+        assistant_response = self._response_cache.get(cache_key)
+        if assistant_response is not None:
+            self._response_cache.move_to_end(cache_key)
+            self._record_exchange(user_query, assistant_response)
+            yield assistant_response
+            return
+        
         # Build context-aware prompt
         system_prompt = self.build_context_prompt(user_query, search_results)
         
-        # Get response from OpenAI
+        # Get response from OpenAI, passing tokens through as they arrive
+        response_parts = []
         try:
             response = self.openai_client.chat.completions.create(
                 model="gpt-4o",
@@ -136,25 +207,51 @@ Please provide a clear, helpful answer based on the financial policy document pr
                     {"role": "user", "content": user_query}
                 ],
                 temperature=0.1,  # Low temperature for more consistent responses
-                max_tokens=1000
+                max_tokens=1000,
+                stream=True
             )
             
-            assistant_response = response.choices[0].message.content
-            
-            # Update conversation history
-            self.conversation_history.append({
-                "user": user_query,
-                "assistant": assistant_response
-            })
-            
-            # Keep history within limit
-            if len(self.conversation_history) > self.max_history_length:
-                self.conversation_history = self.conversation_history[-self.max_history_length:]
-            
-            return assistant_response
+            for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    response_parts.append(delta)
+                    yield delta
             
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            yield f"Error generating response: {str(e)}"
+            return
+        
+        assistant_response = "".join(response_parts)
+        
+        self._response_cache[cache_key] = assistant_response
+        if len(self._response_cache) > self.max_response_cache_size:
+            self._response_cache.popitem(last=False)
+        
+        self._record_exchange(user_query, assistant_response)
+    
+    def _record_exchange(self, user_query: str, assistant_response: str):
+        """
+        Add a completed exchange to the conversation history and the prompt history.
+        
+        Args:
+            user_query: User's question
+            assistant_response: Chatbot's answer
+        """
+        # Update conversation history (the deque drops exchanges beyond the limit)
+        self.conversation_history.append({
+            "user": user_query,
+            "assistant": assistant_response
+        })
+        
+        # Add the new exchange (the deque drops the oldest past the prompt window)
+        # and number the window 1..N for the prompt
+        self._history_entries.append(
+            f"User: {user_query}\n"
+            f"   Assistant: {assistant_response}\n"
+        )
+        self._history_str = "".join([
+            f"{i}. {entry}" for i, entry in enumerate(self._history_entries, 1)
+        ])
     
     def show_help(self):
         """Display help information for using the chatbot."""
@@ -179,6 +276,7 @@ FEATURES:
 COMMANDS:
 • Type 'help' - Show this help message
 • Type 'history' - Show recent conversation
+• Type 'stats' - Show database statistics
 • Type 'exit' or 'quit' - End the conversation
 
 Just ask your question in plain English!
@@ -198,13 +296,17 @@ Just ask your question in plain English!
             print(f"    Bot: {exchange['assistant'][:100]}{'...' if len(exchange['assistant']) > 100 else ''}")
         print("=" * 50)
     
+    def show_stats(self):
+        """Display database statistics."""
+        print(f"\n📊 Database contains {self.chunk_count} document chunks.")
+    
     def run(self):
         """Run the interactive chatbot."""
         print("\n" + "="*60)
         print("🏛️  FINANCIAL POLICY CHATBOT")
         print("="*60)
         print("Ask me anything about the financial policy document!")
-        print("Type 'help' for guidance, 'history' for recent chat, or 'exit' to quit.")
+        print("Type 'help' for guidance, 'history' for recent chat, 'stats' for database info, or 'exit' to quit.")
         print("-"*60)
         
         while True:
@@ -224,11 +326,16 @@ Just ask your question in plain English!
                 elif user_input.lower() == 'history':
                     self.show_history()
                     continue
+                elif user_input.lower() == 'stats':
+                    self.show_stats()
+                    continue
                 
                 # Get and display response
                 print("\n Searching policy document...")
-                response = self.get_response(user_input)
-                print(f"\n Response:\n{response}")
+                print("\n Response:")
+                for response_part in self.stream_response(user_input):
+                    print(response_part, end="", flush=True)
+                print()
                 print("-"*60)
                 
             except KeyboardInterrupt: